@@ -6,26 +6,76 @@ from sklearn.metrics import mean_squared_error, mean_absolute_error
 import pickle
 from datetime import datetime
 import warnings
-import matplotlib.pyplot as plt
 import os
+import sys
+import subprocess
+import argparse
+from profiling import StageProfiler
+from cv_plots import save_fold_predictions
+from export_model import compile_booster, validate_compiled_model
 
 warnings.filterwarnings('ignore')
 
+parser = argparse.ArgumentParser(
+    description="Train the visitor count model with rolling forecast cross-validation."
+)
+
+parser.add_argument(
+    '--profile',
+    action='store_true',
+    help='Also track peak memory per stage (slower, uses tracemalloc)'
+)
+
+parser.add_argument(
+    '--profile-stage',
+    type=str,
+    default=None,
+    help="Dump cProfile stats for one stage, e.g. 'resampling' or 'cross_validation/fold_1'"
+)
+
+parser.add_argument(
+    '--no-plots',
+    action='store_true',
+    help='Only save fold predictions, render them later with cv_plots.py'
+)
+
+parser.add_argument(
+    '--plot-workers',
+    type=int,
+    default=2,
+    help='Number of processes used to render the CV plots (default: 2)'
+)
+
+args = parser.parse_args()
+
+if args.plot_workers < 1:
+    parser.error('--plot-workers must be at least 1')
+
 FREQ = '15min'
 PERIODS_PER_HOUR = 4
 PERIODS_PER_DAY = 96
 PERIODS_PER_WEEK = 672
 
+# Wall and CPU time per stage are always recorded; memory only with --profile
+profiler = StageProfiler(
+    track_memory=args.profile,
+    cprofile_stage=args.profile_stage,
+    output_dir='./model_results'
+)
+
 
 print("LOADING DATA")
+profiler.begin('loading')
 
 data = pd.read_csv("./clean_data/full_old.csv", delimiter=';', low_memory=False)
 
 print(f"Raw data shape: {data.shape}")
 print(f"Columns: {data.columns.tolist()}")
+profiler.end()
 
 
 print("DATA PREPARATION")
+profiler.begin('preparation')
 
 
 data.rename(columns={
@@ -77,11 +127,13 @@ if n_duplicates > 0:
     duplicate_rows = data[is_duplicate_row]
     print(duplicate_rows.sort_values(['poi_id', 'timestamp']).head(10))
     print("...")
+profiler.end()
 
 # --- 3. RESAMPLE TO REGULAR 15-MIN INTERVALS ---
 print("\n" + "="*60)
 print("RESAMPING TO 15-MIN INTERVALS")
 print("="*60)
+profiler.begin('resampling')
 
 resampled_data = []
 
@@ -148,11 +200,13 @@ print(f"  All gaps are 15min: {(time_diff_minutes.dropna() == 15.0).all()}")
 # Drop remaining NaN values from resampling
 data = data.dropna(subset=['people_count'])
 print(f"  Final shape after dropping NaN: {data.shape}")
+profiler.end()
 
 # --- 4. Feature Engineering ---
 print("\n" + "="*60)
 print("FEATURE ENGINEERING")
 print("="*60)
+profiler.begin('feature_engineering')
 
 def create_features(df):
     """
@@ -162,6 +216,7 @@ def create_features(df):
     df = df.copy()
     
     print("  Creating time features...")
+    profiler.begin('time')
     df['hour'] = df['timestamp'].dt.hour
     df['minute'] = df['timestamp'].dt.minute
     df['day_of_week'] = df['timestamp'].dt.dayofweek
@@ -178,20 +233,29 @@ def create_features(df):
     df['is_evening'] = ((df['hour'] >= 18) & (df['hour'] < 22)).astype(int)
     df['is_night'] = ((df['hour'] >= 22) | (df['hour'] < 6)).astype(int)
     
+    profiler.end()
+    
     # Holiday features
     print("  Creating holiday features...")
+    profiler.begin('holiday')
     df['is_holiday'] = df['is_holiday'].fillna(0).astype(int)
     df['is_holiday_eve'] = df.groupby('poi_id')['is_holiday'].shift(-PERIODS_PER_DAY).fillna(0).astype(int)
     df['is_holiday_aftermath'] = df.groupby('poi_id')['is_holiday'].shift(PERIODS_PER_DAY).fillna(0).astype(int)
     df['is_weekend_or_holiday'] = ((df['is_weekend'] == 1) | (df['is_holiday'] == 1)).astype(int)
     
+    profiler.end()
+    
     # Interaction features
     print("  Creating interaction features...")
+    profiler.begin('interaction')
     df['hour_x_weekend'] = df['hour'].astype(str) + '_' + df['is_weekend'].astype(str)
     df['hour_x_dow'] = df['hour'].astype(str) + '_' + df['day_of_week'].astype(str)
     
+    profiler.end()
+    
     # --- LAG FEATURES ---
     print("  Creating lag features...")
+    profiler.begin('lag')
     lag_configs = {
         'lag_15min': 1,
         'lag_1h': PERIODS_PER_HOUR,
@@ -206,8 +270,11 @@ def create_features(df):
     for name, periods in lag_configs.items():
         df[name] = df.groupby('poi_id')['people_count'].shift(periods)
     
+    profiler.end()
+    
     # --- ROLLING FEATURES ---
     print("  Creating rolling features...")
+    profiler.begin('rolling')
     
     # 1 hour rolling
     df['rolling_mean_1h'] = df.groupby('poi_id')['people_count'].transform(
@@ -253,8 +320,11 @@ def create_features(df):
         lambda x: x.shift(1).rolling(window=PERIODS_PER_WEEK, min_periods=1).std()
     )
     
+    profiler.end()
+    
     # --- TREND FEATURES ---
     print("  Creating trend features...")
+    profiler.begin('trend')
     df['diff_from_1h_ago'] = df['people_count'] - df['lag_1h']
     df['diff_from_yesterday'] = df['people_count'] - df['lag_24h']
     df['diff_from_last_week'] = df['people_count'] - df['lag_7d']
@@ -262,6 +332,7 @@ def create_features(df):
     df['ratio_to_1h_ago'] = df['people_count'] / (df['lag_1h'] + 0.1)
     df['ratio_to_yesterday'] = df['people_count'] / (df['lag_24h'] + 0.1)
     df['ratio_to_last_week'] = df['people_count'] / (df['lag_7d'] + 0.1)
+    profiler.end()
     
     return df
 
@@ -327,16 +398,18 @@ y = df[TARGET]
 print(f"\nFeature matrix: {X.shape}")
 print(f"Target vector: {y.shape}")
 print(f"Memory usage: {X.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+profiler.end()
 
 # --- 6. Cross-Validation ---
 print("\n" + "="*60)
 print("ROLLING FORECAST CROSS-VALIDATION")
 print("="*60)
+profiler.begin('cross_validation')
 
 # 💡 --- NEW CODE: CREATE PLOT DIRECTORY --- 💡
 PLOT_DIR = './model_results/cross_val_plots'
 os.makedirs(PLOT_DIR, exist_ok=True)
-print(f"✓ Plots will be saved to: {PLOT_DIR}")
+print(f"✓ Fold predictions and plots will be saved to: {PLOT_DIR}")
 
 # Use the standard TimeSeriesSplit
 tscv = TimeSeriesSplit(n_splits=5)
@@ -347,6 +420,7 @@ fold_mape = []
 
 for fold, (train_index, test_index) in enumerate(tscv.split(X)):
     print(f"\n--- FOLD {fold + 1} ---")
+    profiler.begin(f'fold_{fold + 1}')
     
     X_train, X_test = X.iloc[train_index], X.iloc[test_index]
     y_train, y_test = y.iloc[train_index], y.iloc[test_index]
@@ -396,63 +470,20 @@ for fold, (train_index, test_index) in enumerate(tscv.split(X)):
     
     print(f"RMSE: {rmse:.2f} | MAE: {mae:.2f} | Scaled MAPE: {mape:.1f}%")
 
-    # 💡 --- NEW PLOTTING BLOCK --- 💡
-    print("  Generating plots...")
-    
-    # 1. Create a DataFrame for easy plotting
-    # We use df.iloc[test_index] to get the correct poi_id and timestamp
-    plot_df = pd.DataFrame({
-        'timestamp': df.iloc[test_index]['timestamp'],
-        'poi_id': df.iloc[test_index]['poi_id'],
-        'actual': y_test,
-        'predicted': preds
-    })
-    
-    # 2. Get all unique POIs in this test set
-    pois = plot_df['poi_id'].unique()
-    n_pois = len(pois)
-    
-    # 3. Set up the subplot grid
-    n_cols = 5  # 5 plots wide
-    n_rows = int(np.ceil(n_pois / n_cols)) # Calculate rows needed
-    
-    fig, axes = plt.subplots(n_rows, n_cols, figsize=(20, n_rows * 4))
-    axes = axes.flatten() # Make it easy to iterate
-    
-    # 4. Loop through each POI and create its subplot
-    for i, poi_name in enumerate(pois):
-        ax = axes[i]
-        
-        # Filter data for this POI (handling the 'nan' POI)
-        if pd.isna(poi_name):
-            poi_data = plot_df[plot_df['poi_id'].isna()]
-            title = "POI: nan"
-        else:
-            poi_data = plot_df[plot_df['poi_id'] == poi_name]
-            title = poi_name
-        
-        # Plot the lines
-        poi_data.plot(x='timestamp', y='actual', label='Actual', ax=ax, alpha=0.8)
-        poi_data.plot(x='timestamp', y='predicted', label='Predicted', ax=ax, linestyle='--', alpha=0.8)
-        
-        # Format the subplot
-        ax.set_title(title, fontsize=10)
-        ax.legend()
-        ax.tick_params(axis='x', rotation=45, labelsize=8)
-        ax.set_xlabel('Timestamp', fontsize=8)
-
-    # 5. Hide any unused subplots
-    for i in range(n_pois, len(axes)):
-        axes[i].set_visible(False)
-        
-    # 6. Set main title and save
-    fig.suptitle(f'Cross-Validation Fold {fold + 1} (Test: {test_dates.min().date()} to {test_dates.max().date()})', fontsize=16, y=1.02)
-    plt.tight_layout()
-    plot_filename = os.path.join(PLOT_DIR, f'fold_{fold + 1}_predictions.png')
-    plt.savefig(plot_filename)
-    plt.close(fig) # Close figure to free memory
-    print(f"  ✓ Plot saved to: {plot_filename}")
-    # 💡 --- END OF PLOTTING BLOCK --- 💡
+    # Persist predictions only; the figures are rendered after CV by cv_plots.py
+    predictions_filename = os.path.join(PLOT_DIR, f'fold_{fold + 1}_predictions.npz')
+    save_fold_predictions(
+        predictions_filename,
+        timestamps=test_dates,
+        poi_ids=df.iloc[test_index]['poi_id'],
+        actual=y_test,
+        predicted=preds,
+        title=f'Cross-Validation Fold {fold + 1} (Test: {test_dates.min().date()} to {test_dates.max().date()})'
+    )
+    print(f"  ✓ Predictions saved to: {predictions_filename}")
+    profiler.end()
+
+profiler.end()
 
 
 # --- 7. Results ---
@@ -467,6 +498,7 @@ print(f"Average MAPE: {np.mean(fold_mape):.1f}% ± {np.std(fold_mape):.1f}%")
 print("\n" + "="*60)
 print("TRAINING FINAL MODEL")
 print("="*60)
+profiler.begin('final_model')
 
 final_model = lgb.LGBMRegressor(
     objective='regression',
@@ -487,11 +519,35 @@ final_model = lgb.LGBMRegressor(
 
 final_model.fit(X, y, categorical_feature=categorical_cols)
 print(f"✓ Final model trained on {len(X):,} samples")
+profiler.end()
+
+# Flat NumPy export of the trees, checked against booster.predict on a sample.
+# Done before any model artifact is written so a failed check leaves the previous
+# run's model files, compiled arrays, feature importance and metadata in step.
+profiler.begin('export_model')
+COMPILED_MODEL_DIR = './model_results/compiled_model'
+compiled_model = compile_booster(final_model.booster_, categorical_cols)
+compiled_max_diff = validate_compiled_model(
+    final_model.booster_, compiled_model, X.sample(n=min(2000, len(X)), random_state=42)
+)
+profiler.end()
+
+# Render the CV plots in the background once the final model is trained,
+# so the renderer does not compete with LightGBM for cores during fit
+plot_process = None
+if not args.no_plots:
+    cv_plots_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cv_plots.py')
+    plot_cmd = [sys.executable, cv_plots_script, PLOT_DIR, '--workers', str(args.plot_workers)]
+    plot_process = subprocess.Popen(plot_cmd)
+    print(f"✓ Rendering CV plots in the background (pid {plot_process.pid})")
+else:
+    print(f"✓ Skipping CV plots, render later with: python cv_plots.py {PLOT_DIR}")
 
 # --- 9. Feature Importance ---
 print("\n" + "="*60)
 print("TOP 25 FEATURES BY IMPORTANCE")
 print("="*60)
+profiler.begin('feature_importance')
 
 feature_importance = pd.DataFrame({
     'feature': FEATURES,
@@ -504,15 +560,19 @@ for idx, row in feature_importance.head(25).iterrows():
 # Save feature importance
 feature_importance.to_csv('./model_results/feature_importance.csv', index=False)
 print("\n✓ Feature importance saved to: feature_importance.csv")
+profiler.end()
 
 # --- 10. Save Model ---
 print("\n" + "="*60)
 print("SAVING MODEL & METADATA")
 print("="*60)
 
+profiler.begin('save_model')
 with open('./model_results/live_model.pkl', 'wb') as f:
     pickle.dump(final_model, f)
 final_model.booster_.save_model('./model_results/live_model.txt')
+compiled_model.save(COMPILED_MODEL_DIR)
+profiler.end()
 
 metadata = {
     'training_date': datetime.now().isoformat(),
@@ -535,7 +595,13 @@ metadata = {
         'mape_mean': float(np.mean(fold_mape)),
         'mape_std': float(np.std(fold_mape))
     },
-    'pois': df['poi_id'].unique().tolist()
+    'pois': df['poi_id'].unique().tolist(),
+    'compiled_model': {
+        'path': COMPILED_MODEL_DIR,
+        'n_trees': len(compiled_model.tree_root),
+        'max_abs_diff': compiled_max_diff
+    },
+    'profiling': profiler.report()
 }
 
 import json
@@ -545,6 +611,7 @@ with open('./model_results/model_metadata.json', 'w') as f:
 print("✓ Model saved:")
 print("  - live_model.pkl (for Python)")
 print("  - live_model.txt (LGBM format)")
+print(f"  - compiled_model/ (NumPy arrays, max deviation {compiled_max_diff:.3g})")
 print("✓ Metadata saved: model_metadata.json")
 
 print("\n" + "="*60)
@@ -555,4 +622,13 @@ print(f"   Training samples: {len(X):,}")
 print(f"   Date range: {df['timestamp'].min().date()} to {df['timestamp'].max().date()}")
 print(f"   POIs: {df['poi_id'].nunique()}")
 print(f"   CV RMSE: {np.mean(fold_rmse):.2f}")
-print(f"   CV MAE: {np.mean(fold_mae):.2f}")
\ No newline at end of file
+print(f"   CV MAE: {np.mean(fold_mae):.2f}")
+
+print(f"\n⏱  Stage Timings:")
+profiler.print_summary()
+profiler.warn_unmatched_cprofile_stage()
+
+if plot_process is not None:
+    print("\nWaiting for CV plot rendering to finish...")
+    if plot_process.wait() != 0:
+        print(f"⚠ CV plot rendering failed (exit code {plot_process.returncode})")
\ No newline at end of file
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+# Above this many points per line a series is reduced to per-bucket min/max
+MAX_POINTS_PER_SERIES = 2000
+
+
+def save_fold_predictions(path, timestamps, poi_ids, actual, predicted, title):
+    """
+    Persists one fold's test predictions compactly so plots can be rendered later.
+    POIs are stored as integer codes (-1 for a missing POI) plus a name table.
+    """
+    poi = pd.Categorical(poi_ids)
+    np.savez_compressed(
+        path,
+        timestamp=pd.DatetimeIndex(timestamps).as_unit('ns').asi8,
+        poi_code=poi.codes.astype(np.int16),
+        poi_names=np.asarray(poi.categories.astype(str), dtype=str),
+        actual=np.asarray(actual, dtype=np.float32),
+        predicted=np.asarray(predicted, dtype=np.float32),
+        title=np.array(title)
+    )
+
+
+def minmax_downsample(x, y, max_points=MAX_POINTS_PER_SERIES):
+    """
+    Keeps the min and max sample of each bucket so peaks survive downsampling.
+    """
+    n = len(y)
+    if n <= max_points:
+        return x, y
+
+    bucket = int(np.ceil(n / (max_points // 2)))
+    n_full = n // bucket * bucket
+    offsets = np.arange(0, n_full, bucket)
+
+    blocks = y[:n_full].reshape(-1, bucket)
+    keep = [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    if n_full < n:
+        tail = y[n_full:]
+        keep.append(np.array([n_full + tail.argmin(), n_full + tail.argmax()]))
+
+    idx = np.unique(np.concatenate(keep))
+    return x[idx], y[idx]
+
+
+def render_fold_plot(npz_path):
+    """
+    Renders the per-POI actual vs. predicted grid for one saved fold.
+    """
+    data = np.load(npz_path)
+    codes = data['poi_code']
+    names = data['poi_names']
+
+    # Single split: order rows by (POI, time) once and cut at the POI boundaries
+    order = np.lexsort((data['timestamp'], codes))
+    codes_sorted = codes[order]
+    timestamps = data['timestamp'][order].astype('datetime64[ns]')
+    actual = data['actual'][order]
+    predicted = data['predicted'][order]
+
+    unique_codes, starts = np.unique(codes_sorted, return_index=True)
+    ends = np.append(starts[1:], len(codes_sorted))
+
+    # Keep the POIs in order of first appearance, as in the test set
+    _, first_seen = np.unique(codes, return_index=True)
+    poi_order = np.argsort(first_seen)
+
+    n_pois = len(unique_codes)
+    n_cols = 5  # 5 plots wide
+    n_rows = int(np.ceil(n_pois / n_cols))
+
+    fig, axes = plt.subplots(n_rows, n_cols, figsize=(20, n_rows * 4), squeeze=False)
+    axes = axes.flatten()
+
+    for i, j in enumerate(poi_order):
+        ax = axes[i]
+        code = unique_codes[j]
+        rows = slice(starts[j], ends[j])
+        title = "POI: nan" if code < 0 else names[code]
+
+        ax.plot(*minmax_downsample(timestamps[rows], actual[rows]), label='Actual', alpha=0.8)
+        ax.plot(*minmax_downsample(timestamps[rows], predicted[rows]), label='Predicted', linestyle='--', alpha=0.8)
+
+        ax.set_title(title, fontsize=10)
+        ax.legend()
+        ax.tick_params(axis='x', rotation=45, labelsize=8)
+        ax.set_xlabel('Timestamp', fontsize=8)
+
+    for i in range(n_pois, len(axes)):
+        axes[i].set_visible(False)
+
+    fig.suptitle(str(data['title']), fontsize=16, y=1.02)
+    fig.tight_layout()
+    plot_filename = npz_path[:-len('.npz')] + '.png'
+    fig.savefig(plot_filename)
+    plt.close(fig)
+    return plot_filename
+
+
+def render_all(plot_dir, max_workers=None):
+    """
+    Renders every saved fold in plot_dir in a process pool.
+    """
+    paths = sorted(glob.glob(os.path.join(plot_dir, 'fold_*_predictions.npz')))
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for plot_filename in pool.map(render_fold_plot, paths):
+            print(f"  ✓ Plot saved to: {plot_filename}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Render cross-validation prediction plots saved by analysis.py."
+    )
+
+    parser.add_argument(
+        'plot_dir',
+        type=str,
+        help='Directory containing fold_*_predictions.npz files'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Number of rendering processes (default: CPU count)'
+    )
+
+    args = parser.parse_args()
+
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    render_all(args.plot_dir, args.workers)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+import argparse
+import json
+
+import numpy as np
+import lightgbm as lgb
+
+from tree_evaluator import CompiledModel
+
+OBJECTIVE_TRANSFORMS = {
+    'regression': 'identity',
+    'regression_l1': 'identity',
+    'huber': 'identity',
+    'fair': 'identity',
+    'quantile': 'identity',
+    'mape': 'identity',
+    'poisson': 'exp',
+    'gamma': 'exp',
+    'tweedie': 'exp',
+}
+
+# Maximum allowed |compiled - booster.predict| during validation
+TOLERANCE = 1e-6
+
+
+def _parse_model_string(model_string):
+    """
+    Splits a LightGBM text model into its header and per-tree key=value blocks.
+    The text format keeps full double precision for thresholds, dump_model() does not.
+    """
+    header, trees, current = {}, [], None
+    for line in model_string.splitlines():
+        if line.startswith('end of trees'):
+            break
+        if line.startswith('Tree='):
+            current = {}
+            trees.append(current)
+        elif '=' in line:
+            key, value = line.split('=', 1)
+            (header if current is None else current)[key] = value
+        elif line and current is None:
+            header[line] = ''
+    return header, trees
+
+
+def _tree_array(tree, key, dtype):
+    return np.array(tree.get(key, '').split(), dtype=dtype)
+
+
+def compile_booster(booster, categorical_features):
+    """
+    Flattens all trees of a LightGBM booster into NumPy arrays for CompiledModel.
+    categorical_features must list the columns that had a pandas category dtype.
+    """
+    header, trees = _parse_model_string(booster.model_to_string())
+    feature_names = header['feature_names'].split()
+
+    objective = header['objective'].split()[0]
+    if objective not in OBJECTIVE_TRANSFORMS:
+        raise ValueError(f"Objective '{objective}' is not supported by the compiled evaluator")
+    if int(header['num_tree_per_iteration']) != 1 or 'average_output' in header:
+        raise ValueError("Only single-output boosted models can be compiled")
+
+    # pandas_categorical holds the category lists in column order of the categorical features
+    categorical_names = [name for name in feature_names if name in categorical_features]
+    pandas_categorical = booster.pandas_categorical or []
+    if len(pandas_categorical) != len(categorical_names):
+        raise ValueError(
+            f"Booster has {len(pandas_categorical)} pandas categories but "
+            f"{len(categorical_names)} categorical features were given"
+        )
+    categories = {
+        name: [v.item() if isinstance(v, np.generic) else v for v in values]
+        for name, values in zip(categorical_names, pandas_categorical)
+    }
+
+    parts = {name: [] for name in [
+        'tree_root', 'split_feature', 'threshold', 'default_left', 'missing_type',
+        'cat_index', 'left_child', 'right_child', 'leaf_value', 'cat_bitsets'
+    ]}
+    cat_boundaries = [0]
+    n_nodes = n_leaves = n_cats = 0
+
+    for tree in trees:
+        leaf_value = _tree_array(tree, 'leaf_value', np.float64)
+        if int(tree['num_leaves']) == 1:
+            parts['tree_root'].append(np.array([~n_leaves]))
+            parts['leaf_value'].append(leaf_value)
+            n_leaves += 1
+            continue
+
+        # Re-base the tree's local node/leaf indices onto the flat arrays
+        def rebase(children):
+            return np.where(children >= 0, children + n_nodes, ~(~children + n_leaves))
+
+        decision_type = _tree_array(tree, 'decision_type', np.int64)
+        is_categorical = (decision_type & 1) == 1
+        threshold = _tree_array(tree, 'threshold', np.float64)
+
+        parts['tree_root'].append(np.array([n_nodes]))
+        parts['split_feature'].append(_tree_array(tree, 'split_feature', np.int32))
+        parts['default_left'].append((decision_type & 2) == 2)
+        parts['missing_type'].append((decision_type >> 2) & 3)
+        parts['left_child'].append(rebase(_tree_array(tree, 'left_child', np.int64)))
+        parts['right_child'].append(rebase(_tree_array(tree, 'right_child', np.int64)))
+        parts['leaf_value'].append(leaf_value)
+
+        # For categorical splits the threshold is an index into the tree's bitsets
+        parts['threshold'].append(np.where(is_categorical, 0.0, threshold))
+        cat_index = np.full(len(threshold), -1)
+        cat_index[is_categorical] = threshold[is_categorical].astype(np.int64) + n_cats
+        parts['cat_index'].append(cat_index)
+        if int(tree['num_cat']) > 0:
+            offset = cat_boundaries[-1]
+            cat_boundaries.extend(_tree_array(tree, 'cat_boundaries', np.int64)[1:] + offset)
+            parts['cat_bitsets'].append(_tree_array(tree, 'cat_threshold', np.uint32))
+            n_cats += int(tree['num_cat'])
+
+        n_nodes += len(decision_type)
+        n_leaves += len(leaf_value)
+
+    dtypes = {
+        'tree_root': np.int32, 'split_feature': np.int32, 'threshold': np.float64,
+        'default_left': bool, 'missing_type': np.int8, 'cat_index': np.int32,
+        'left_child': np.int32, 'right_child': np.int32, 'leaf_value': np.float64,
+        'cat_bitsets': np.uint32
+    }
+    arrays = {
+        name: np.concatenate(chunks).astype(dtypes[name]) if chunks else np.empty(0, dtype=dtypes[name])
+        for name, chunks in parts.items()
+    }
+    arrays['cat_boundaries'] = np.array(cat_boundaries, dtype=np.int32)
+
+    meta = {
+        'feature_names': feature_names,
+        'categories': categories,
+        'output_transform': OBJECTIVE_TRANSFORMS[objective],
+    }
+    return CompiledModel(meta, arrays)
+
+
+def validate_compiled_model(booster, model, X):
+    """
+    Compares the compiled model against booster.predict and returns the max
+    absolute difference. X is a DataFrame of raw features or an encoded matrix.
+    """
+    if hasattr(X, 'columns'):
+        compiled_preds = model.predict(X)
+    else:
+        compiled_preds = model.predict_matrix(X)
+    booster_preds = booster.predict(X)
+
+    max_diff = float(np.max(np.abs(compiled_preds - booster_preds), initial=0.0))
+    if max_diff > TOLERANCE:
+        raise RuntimeError(
+            f"Compiled model deviates from booster.predict by {max_diff:.3g} (tolerance {TOLERANCE:g})"
+        )
+    return max_diff
+
+
+def synthetic_rows(model, n_rows=5000, seed=42):
+    """
+    Builds an encoded feature matrix that exercises both sides of every split,
+    missing values and every known category, for validating without training data.
+    """
+    rng = np.random.default_rng(seed)
+    numerical = np.asarray(model.cat_index) < 0
+    split_feature = np.asarray(model.split_feature)
+    threshold = np.asarray(model.threshold)
+
+    X = np.empty((n_rows, len(model.feature_names)))
+    for i, name in enumerate(model.feature_names):
+        if name in model.categories:
+            candidates = np.arange(len(model.categories[name]), dtype=np.float64)
+        else:
+            t = threshold[numerical & (split_feature == i)]
+            candidates = np.concatenate([t, np.nextafter(t, np.inf), [0.0]])
+        X[:, i] = rng.choice(np.append(candidates, np.nan), size=n_rows)
+    return X
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compile a LightGBM model file into NumPy arrays for tree_evaluator.py."
+    )
+
+    parser.add_argument(
+        'model_file',
+        type=str,
+        help='Path to the LightGBM text model, e.g. ./model_results/live_model.txt'
+    )
+
+    parser.add_argument(
+        '--metadata',
+        type=str,
+        default='./model_results/model_metadata.json',
+        help='model_metadata.json listing the categorical features'
+    )
+
+    parser.add_argument(
+        '--out',
+        type=str,
+        default='./model_results/compiled_model',
+        help='Output directory for the compiled model'
+    )
+
+    args = parser.parse_args()
+
+    with open(args.metadata) as f:
+        categorical_features = json.load(f)['categorical_features']
+
+    booster = lgb.Booster(model_file=args.model_file)
+    model = compile_booster(booster, categorical_features)
+    max_diff = validate_compiled_model(booster, model, synthetic_rows(model))
+    model.save(args.out)
+
+    print(f"✓ Compiled {len(model.tree_root)} trees to: {args.out}")
+    print(f"  Max deviation from booster.predict: {max_diff:.3g}")
@@ -0,0 +1,96 @@
+import cProfile
+import os
+import time
+import tracemalloc
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time and (optionally) peak traced memory for
+    named pipeline stages. Stages can be nested, e.g. 'cross_validation/fold_1'.
+    """
+
+    def __init__(self, track_memory=False, cprofile_stage=None, output_dir='.'):
+        self.track_memory = track_memory
+        self.cprofile_stage = cprofile_stage
+        self.output_dir = output_dir
+        self.records = []
+        self._stack = []
+        self._cprofile = None
+
+        if self.track_memory:
+            tracemalloc.start()
+
+    def begin(self, name):
+        if self._stack:
+            name = f"{self._stack[-1]['name']}/{name}"
+
+        if self.track_memory:
+            # Fold the parent's peak so far in before resetting for the child
+            if self._stack:
+                parent = self._stack[-1]
+                parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        record = {'name': name}
+        self.records.append(record)
+        self._stack.append({
+            'name': name,
+            'record': record,
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+            'peak': 0,
+        })
+
+        if name == self.cprofile_stage:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def end(self):
+        frame = self._stack.pop()
+        record = frame['record']
+        name = frame['name']
+
+        if name == self.cprofile_stage and self._cprofile is not None:
+            self._cprofile.disable()
+            prof_path = os.path.join(self.output_dir, f"profile_{name.replace('/', '_')}.prof")
+            self._cprofile.dump_stats(prof_path)
+            self._cprofile = None
+            record['cprofile'] = prof_path
+            print(f"  ✓ cProfile stats for '{name}' saved to: {prof_path}")
+
+        record['wall_s'] = round(time.perf_counter() - frame['wall'], 3)
+        record['cpu_s'] = round(time.process_time() - frame['cpu'], 3)
+
+        if self.track_memory:
+            peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+            record['peak_mb'] = round(peak / 1024**2, 1)
+            if self._stack:
+                parent = self._stack[-1]
+                parent['peak'] = max(parent['peak'], peak)
+
+    def report(self):
+        """
+        Returns the finished stages in start order, ready for model_metadata.json.
+        """
+        return {
+            'memory_tracked': self.track_memory,
+            'stages': [r for r in self.records if 'wall_s' in r],
+        }
+
+    def print_summary(self):
+        for r in self.report()['stages']:
+            indent = '  ' * r['name'].count('/')
+            line = f"{indent}{r['name'].rsplit('/', 1)[-1]:<{30 - len(indent)}s} wall {r['wall_s']:8.2f}s  cpu {r['cpu_s']:8.2f}s"
+            if 'peak_mb' in r:
+                line += f"  peak {r['peak_mb']:8.1f} MB"
+            print(line)
+
+    def warn_unmatched_cprofile_stage(self):
+        """
+        Warns if --profile-stage named a stage that never ran, so no .prof file was written.
+        """
+        names = [r['name'] for r in self.records]
+        if self.cprofile_stage is not None and self.cprofile_stage not in names:
+            print(f"⚠ cProfile stage '{self.cprofile_stage}' did not match any stage, no stats were saved")
+            print(f"  Known stages: {', '.join(names)}")
@@ -0,0 +1,143 @@
+import json
+import os
+
+import numpy as np
+
+MISSING_NONE = 0
+MISSING_ZERO = 1
+MISSING_NAN = 2
+
+# Same threshold LightGBM uses to treat a value as zero (a float32 constant there)
+K_ZERO_THRESHOLD = float(np.float32(1e-35))
+
+# Tree roots and children use one encoding: >= 0 is a node index, < 0 is leaf ~child
+ARRAY_NAMES = [
+    'tree_root', 'split_feature', 'threshold', 'default_left', 'missing_type',
+    'cat_index', 'left_child', 'right_child', 'leaf_value',
+    'cat_boundaries', 'cat_bitsets'
+]
+
+OUTPUT_TRANSFORMS = {
+    'identity': lambda raw: raw,
+    'exp': np.exp,
+}
+
+
+class CompiledModel:
+    """
+    Evaluates a LightGBM tree ensemble exported by export_model.py using only NumPy.
+    All trees are walked for a whole batch of rows at once, one tree level per step.
+    """
+
+    def __init__(self, meta, arrays):
+        self.feature_names = meta['feature_names']
+        self.categories = meta['categories']
+        self.output_transform = meta['output_transform']
+        for name in ARRAY_NAMES:
+            setattr(self, name, arrays[name])
+
+        self._category_lookup = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self.categories.items()
+        }
+
+    @classmethod
+    def load(cls, model_dir, mmap=True):
+        with open(os.path.join(model_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(model_dir, f'{name}.npy'), mmap_mode='r' if mmap else None)
+            for name in ARRAY_NAMES
+        }
+        return cls(meta, arrays)
+
+    def save(self, model_dir):
+        os.makedirs(model_dir, exist_ok=True)
+        meta = {
+            'feature_names': self.feature_names,
+            'categories': self.categories,
+            'output_transform': self.output_transform,
+            'n_trees': len(self.tree_root),
+        }
+        with open(os.path.join(model_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(model_dir, f'{name}.npy'), getattr(self, name))
+
+    def encode(self, columns):
+        """
+        Builds the float feature matrix from a mapping of column name -> values
+        (e.g. a DataFrame). Categorical values are replaced by their training
+        category code, unseen categories become NaN like in LightGBM.
+        """
+        matrix = np.empty((len(columns[self.feature_names[0]]), len(self.feature_names)))
+        for i, name in enumerate(self.feature_names):
+            values = np.asarray(columns[name])
+            if name in self._category_lookup:
+                lookup = self._category_lookup[name]
+                matrix[:, i] = [lookup.get(v, np.nan) for v in values.tolist()]
+            else:
+                matrix[:, i] = values
+        return matrix
+
+    def predict(self, columns):
+        return self.predict_matrix(self.encode(columns))
+
+    def predict_matrix(self, X, batch_size=512):
+        """
+        Predicts from an already encoded (n_rows, n_features) float matrix.
+        Rows are processed in batches to bound the (row, tree) working set.
+        """
+        X = np.array(X, dtype=np.float64)
+        # LightGBM's dense predictor drops near-zero entries, so they read as exactly 0
+        X[np.abs(X) <= K_ZERO_THRESHOLD] = 0.0
+        raw = np.concatenate(
+            [self._raw_score(X[i:i + batch_size]) for i in range(0, len(X), batch_size)]
+            or [np.empty(0)]
+        )
+        return OUTPUT_TRANSFORMS[self.output_transform](raw)
+
+    def _raw_score(self, X):
+        n_rows, n_trees = len(X), len(self.tree_root)
+
+        # One entry per (row, tree) pair; only pairs not yet at a leaf are advanced
+        pair_row = np.repeat(np.arange(n_rows), n_trees)
+        node = np.tile(np.asarray(self.tree_root), n_rows)
+        active = np.nonzero(node >= 0)[0]
+
+        while active.size:
+            current = node[active]
+            fval = X[pair_row[active], self.split_feature[current]]
+            node[active] = np.where(
+                self._go_left(fval, current), self.left_child[current], self.right_child[current]
+            )
+            active = active[node[active] >= 0]
+
+        return np.asarray(self.leaf_value)[~node].reshape(n_rows, n_trees).sum(axis=1)
+
+    def _go_left(self, fval, node):
+        is_nan = np.isnan(fval)
+        missing = self.missing_type[node]
+
+        # Numerical splits, mirroring LightGBM's NumericalDecision
+        value = np.where(is_nan & (missing != MISSING_NAN), 0.0, fval)
+        use_default = (
+            ((missing == MISSING_ZERO) & (np.abs(value) <= K_ZERO_THRESHOLD))
+            | ((missing == MISSING_NAN) & is_nan)
+        )
+        go_left = np.where(use_default, self.default_left[node], value <= self.threshold[node])
+
+        # Categorical splits: left if the category's bit is set, NaN/negative go right
+        cat = self.cat_index[node]
+        is_cat = cat >= 0
+        if is_cat.any():
+            cat = cat[is_cat]
+            code = np.where(is_nan[is_cat], -1, fval[is_cat]).astype(np.int64)
+            start = self.cat_boundaries[cat]
+            n_words = self.cat_boundaries[cat + 1] - start
+            word = code >> 5
+            in_set = (code >= 0) & (word < n_words)
+            bits = self.cat_bitsets[np.where(in_set, start + word, 0)]
+            go_left[is_cat] = in_set & (((bits >> (code & 31)) & 1) == 1)
+
+        return go_left